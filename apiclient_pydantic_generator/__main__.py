@@ -1,22 +1,38 @@
+from __future__ import annotations
+
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
+from functools import lru_cache
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Type, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple, Type
 
-import toml
 import typer
-from datamodel_code_generator import Error, chdir
-from datamodel_code_generator.__main__ import Config, Exit
-from datamodel_code_generator.format import CodeFormatter as BlackCodeFormatter
-from datamodel_code_generator.imports import Import, Imports
-from datamodel_code_generator.reference import Reference
-from datamodel_code_generator.types import DataType
-from jinja2 import Environment, FileSystemLoader
-from pydantic.networks import AnyUrl
 
-from .format import YapfCodeFormatter
-from .parser import OpenAPIParser, Operation
+from .format import (
+    BaseCodeFormatter, BlackCodeFormatter,
+    CodeFormatterError, RuffCodeFormatter, YapfCodeFormatter,
+)
+
+
+if TYPE_CHECKING:
+    from datamodel_code_generator import PythonVersion
+    from datamodel_code_generator.__main__ import Config
+    from datamodel_code_generator.imports import Import, Imports
+    from datamodel_code_generator.reference import Reference
+    from datamodel_code_generator.types import DataType
+    from pydantic.networks import AnyUrl
+
+    from .parser import Operation
+
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    import tomli as tomllib
 
 
 app = typer.Typer()
@@ -25,15 +41,19 @@ BUILTIN_TEMPLATE_DIR = Path(__file__).parent / 'templates'
 
 MODEL_PATH: Path = Path('models.py')
 
+_code_formatter: Optional[BaseCodeFormatter] = None
+
 
 class Formatters(str, Enum):
     YAPF = 'yapf'
     BLACK = 'black'
+    RUFF = 'ruff'
 
 
 formaters = {
     Formatters.YAPF.value: YapfCodeFormatter,
     Formatters.BLACK.value: BlackCodeFormatter,
+    Formatters.RUFF.value: RuffCodeFormatter,
 }
 
 
@@ -55,22 +75,37 @@ def main(
         '-a',
         help='Base class for client class',
     ),
-    formater: Optional[Formatters] = typer.Option(Formatters.YAPF.value, case_sensitive=False),  # noqa: B008
+    formatter: Optional[Formatters] = typer.Option(  # noqa: B008
+        Formatters.YAPF.value,
+        '--formatter',
+        '--formater',
+        case_sensitive=False,
+    ),
     skip_deprecated: Optional[bool] = typer.Option(  # noqa: B008
         True,
         '--skip-deprecated',
         help="Don't generate code for deprecated operations",
     ),
+    format_cache: bool = typer.Option(  # noqa: B008
+        True,
+        '--format-cache/--no-format-cache',
+        help='Reuse formatted code cached in $XDG_CACHE_HOME/apiclient-pydantic-generator',
+    ),
 ) -> None:
+    # datamodel-code-generator pulls in black, isort and pydantic models, keep `--help` fast
+    from datamodel_code_generator import Error
+    from datamodel_code_generator.__main__ import Config, Exit
+
     input_name: str = input_file.name
     input_text: str = input_file.read()
 
     pyproject_toml_path = Path().resolve() / 'pyproject.toml'
     if pyproject_toml_path.is_file():
-        pyproject_toml: Dict[str, Any] = {
-            k.replace('-', '_'): v
-            for k, v in toml.load(str(pyproject_toml_path)).get('tool', {}).get('datamodel-codegen', {}).items()
-        }
+        with pyproject_toml_path.open('rb') as file:
+            pyproject_toml: Dict[str, Any] = {
+                k.replace('-', '_'): v
+                for k, v in tomllib.load(file).get('tool', {}).get('datamodel-codegen', {}).items()
+            }
     else:
         pyproject_toml = {}
 
@@ -79,31 +114,111 @@ def main(
     except Error as e:
         print(e.message, file=sys.stderr)
         return Exit.ERROR
-    return generate_code(
-        input_name,
-        input_text,
-        output_dir,
-        template_dir,
-        base_url,
-        data_config,
-        prefix_api_cls,
-        base_apiclient_cls,
-        skip_deprecated,
-        formaters.get(formater.value) or YapfCodeFormatter,
-    )
+    code_formatter_cls = formaters.get(formatter.value) or YapfCodeFormatter
+    try:
+        # fail before parsing the spec, not from inside the formatting workers
+        code_formatter_cls.check_available()
+        return generate_code(
+            input_name,
+            input_text,
+            output_dir,
+            template_dir,
+            base_url,
+            data_config,
+            prefix_api_cls,
+            base_apiclient_cls,
+            skip_deprecated,
+            code_formatter_cls,
+            format_cache,
+        )
+    except CodeFormatterError as e:
+        print(e, file=sys.stderr)
+        raise typer.Exit(code=Exit.ERROR)
 
 
 def _get_most_of_reference(data_type: DataType) -> Optional[Reference]:
-    if data_type.reference:
-        return data_type.reference
-    for data_type in data_type.data_types:
-        reference = _get_most_of_reference(data_type)
-        if reference:
-            return reference
+    stack: List[DataType] = [data_type]
+    while stack:
+        data_type = stack.pop()
+        if data_type.reference:
+            return data_type.reference
+        # reversed keeps the depth-first, left-to-right order of the nested types
+        stack.extend(reversed(data_type.data_types))
     return None
 
 
+@lru_cache(maxsize=None)
+def _import_from_full_path(class_path: str) -> Import:
+    # Import.from_full_path has its own cache, but it only keeps the last 128 paths
+    from datamodel_code_generator.imports import Import
+
+    return Import.from_full_path(class_path)
+
+
+def _merge_imports(imports: Imports, other: Imports) -> None:
+    # set |= copies into our own sets, dict.update would share (and later mutate) the parser's ones
+    for from_, import_ in other.items():
+        imports[from_] |= import_
+
+
+def _init_format_worker(
+    code_formatter_cls: Type[BaseCodeFormatter],
+    python_version: PythonVersion,
+    settings_path: Path,
+) -> None:
+    global _code_formatter
+    # the parent already looked up the cache and writes it back, workers only format
+    _code_formatter = code_formatter_cls(python_version, settings_path, cache_enabled=False)
+
+
+def _format_worker(codes: List[str]) -> List[str]:
+    return _code_formatter.format_many(codes)
+
+
+def _format_sources(
+    sources: Dict[Path, str],
+    code_formatter_cls: Type[BaseCodeFormatter],
+    python_version: PythonVersion,
+    settings_path: Path,
+    cache_enabled: bool = True,
+) -> Dict[Path, str]:
+    """Format every non-empty source missing from the cache in a pool of worker processes, one batch per worker."""
+    code_formatter = code_formatter_cls(python_version, settings_path, cache_enabled=cache_enabled)
+    results = dict.fromkeys(sources, '')
+    tasks: List[Tuple[Path, str]] = []
+    for path, code in sources.items():
+        if not code:
+            continue
+        cached = code_formatter.read_cache(code)
+        if cached is None:
+            tasks.append((path, code))
+        else:
+            results[path] = cached
+    code_formatter.prune_cache()
+    if not tasks:
+        return results
+    workers = min(len(tasks), os.cpu_count() or 1)
+    if workers == 1:
+        # starting a worker costs more than formatting a lone batch here
+        results.update(zip((path for path, _ in tasks), code_formatter.format_many([code for _, code in tasks])))
+        return results
+    batches = [tasks[index::workers] for index in range(workers)]
+    with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_format_worker,
+            initargs=(code_formatter_cls, python_version, settings_path),
+    ) as executor:
+        futures = [executor.submit(_format_worker, [code for _, code in batch]) for batch in batches]
+        for batch, future in zip(batches, futures):
+            for (path, code), formatted in zip(batch, future.result()):
+                results[path] = formatted
+                code_formatter.write_cache(code, formatted)
+    return results
+
+
 def make_aliases(base_aliases: str) -> Optional[Dict[str, str]]:
+    from datamodel_code_generator.__main__ import Exit
+
     with base_aliases as data:
         try:
             aliases = json.load(data)
@@ -129,8 +244,15 @@ def generate_code(
     prefix_api_cls: Optional[str],
     base_apiclient_cls: Optional[str],
     skip_deprecated: Optional[bool],
-    code_formatter_cls: Type[Union[YapfCodeFormatter, BlackCodeFormatter]],
+    code_formatter_cls: Type[BaseCodeFormatter],
+    format_cache: bool = True,
 ) -> None:
+    from datamodel_code_generator import chdir
+    from datamodel_code_generator.imports import Imports
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+    from .parser import OpenAPIParser
+
     output_dir.mkdir(parents=True, exist_ok=True)
     template_dir = template_dir or BUILTIN_TEMPLATE_DIR
 
@@ -181,58 +303,61 @@ def generate_code(
     else:
         raise Exception('Modular references are not supported in this version')
 
-    environment: Environment = Environment(loader=FileSystemLoader(
-        template_dir if template_dir else f'{Path(__file__).parent}/templates',
-        encoding='utf8',
-    ))
-    base_cls = Import.from_full_path(base_apiclient_cls)
+    environment: Environment = Environment(
+        loader=FileSystemLoader(template_dir, encoding='utf8'),
+        bytecode_cache=FileSystemBytecodeCache(),
+        auto_reload=False,
+    )
+    base_cls = _import_from_full_path(base_apiclient_cls)
     imports = Imports()
-    imports.update(parser.imports)
+    _merge_imports(imports, parser.imports)
+    # the same DataType is collected once per request/response that uses it
+    seen_data_types: Set[int] = set()
     for data_type in parser.data_types:
+        if id(data_type) in seen_data_types:
+            continue
+        seen_data_types.add(id(data_type))
         reference = _get_most_of_reference(data_type)
         if reference:
             imports.append(data_type.all_imports)
-            imports.append(Import.from_full_path(f'.{MODEL_PATH.stem}.{reference.name}'))
-
-    for from_, imports_ in parser.imports_for_endpoints.items():
-        imports[from_].update(imports_)
-
-    results: Dict[Path, str] = {}
-
-    code_formatter = code_formatter_cls(data_config.target_python_version, Path().resolve())
-    sorted_operations: List[Operation] = sorted(parser.operations.values(), key=lambda m: m.path)
-
-    for target in template_dir.rglob('*'):
-        relative_path = target.relative_to(template_dir)
-        result = environment.get_template(str(relative_path)).render(
-            operations=sorted_operations,
-            imports=imports,
-            info=parser.parse_info(),
-            servers=parser.parse_servers(),
-            base_url=base_url,
-            prefix_cls=prefix_api_cls,
-            base_cls=base_cls,
-        )
-        results[relative_path] = code_formatter.format_code(result)
+            imports.append(_import_from_full_path(f'.{MODEL_PATH.stem}.{reference.name}'))
 
-    for path, code in results.items():
-        with output_dir.joinpath(path.with_suffix('.py')).open('wt') as file:
-            print(code.rstrip(), file=file)
+    _merge_imports(imports, parser.imports_for_endpoints)
+
+    sources: Dict[Path, str] = {}
+
+    sorted_operations: List[Operation] = sorted(parser.operations.values(), key=attrgetter('path'))
+    context: Dict[str, Any] = {
+        'operations': sorted_operations,
+        'imports': imports,
+        'info': parser.parse_info(),
+        'servers': parser.parse_servers(),
+        'base_url': base_url,
+        'prefix_cls': prefix_api_cls,
+        'base_cls': base_cls,
+    }
+
+    # list_templates walks template_dir once and yields files only
+    for template_name in environment.list_templates():
+        output_path = output_dir / Path(template_name).with_suffix('.py')
+        sources[output_path] = environment.get_template(template_name).render(context)
 
     for path, body_and_filename in modules.items():
         body, _ = body_and_filename
-        if path is None:
-            file = None
-        else:
-            if not path.parent.exists():
-                path.parent.mkdir(parents=True)
-            file = path.open('wt', encoding='utf8')
-
-        if body:
-            print(code_formatter.format_code(body).rstrip(), file=file)
+        sources[path] = body
+
+    results = _format_sources(
+        sources,
+        code_formatter_cls,
+        data_config.target_python_version,
+        Path().resolve(),
+        format_cache,
+    )
 
-        if file is not None:
-            file.close()
+    for path, code in results.items():
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        path.write_bytes(code.rstrip().encode('utf8') + b'\n' if code else b'')
 
 
 if __name__ == '__main__':
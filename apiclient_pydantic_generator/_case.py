@@ -0,0 +1,31 @@
+"""Name case converters with the same output as ``stringcase``, precompiled and memoized."""
+import re
+import string
+from functools import lru_cache
+from typing import Pattern
+
+
+RE_SNAKE_SEPARATOR_PATTERN: Pattern[str] = re.compile(r'[\-\.\s]')
+RE_SNAKE_UPPERCASE_PATTERN: Pattern[str] = re.compile(r'[A-Z]')
+RE_CAMEL_JUNK_PATTERN: Pattern[str] = re.compile(r'\w[\s\W]+\w')
+RE_CAMEL_SEPARATOR_PATTERN: Pattern[str] = re.compile(r'[\-_\.\s]([a-z])')
+
+ASCII_LOWERCASE_TABLE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+@lru_cache(maxsize=8192)
+def snakecase(value: str) -> str:
+    value = RE_SNAKE_SEPARATOR_PATTERN.sub('_', str(value))
+    return value[:1].lower() + RE_SNAKE_UPPERCASE_PATTERN.sub(r'_\g<0>', value[1:]).translate(ASCII_LOWERCASE_TABLE)
+
+
+@lru_cache(maxsize=8192)
+def camelcase(value: str) -> str:
+    value = RE_CAMEL_JUNK_PATTERN.sub('', str(value))
+    return value[:1].lower() + RE_CAMEL_SEPARATOR_PATTERN.sub(lambda m: m.group(1).upper(), value[1:])
+
+
+@lru_cache(maxsize=8192)
+def pascalcase(value: str) -> str:
+    value = camelcase(value)
+    return value[:1].upper() + value[1:]
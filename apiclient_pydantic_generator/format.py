@@ -1,9 +1,49 @@
+import dataclasses
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from abc import ABC, abstractmethod
 from enum import Enum
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Pattern, Sequence
 
-import isort
-from yapf.yapflib.yapf_api import FormatCode
+
+CACHE_MAX_AGE: float = 30 * 24 * 60 * 60  # seconds
+
+SPLIT_MARKER: str = '# __APGEN_SPLIT__'
+RE_SPLIT_PATTERN: Pattern[str] = re.compile(rf'^{re.escape(SPLIT_MARKER)}$', re.MULTILINE)
+
+
+class CodeFormatterError(Exception):
+    """The formatter is not available or could not format the generated code."""
+
+
+def get_default_cache_dir() -> Optional[Path]:
+    """``$XDG_CACHE_HOME`` or ``~/.cache``, None when the home directory cannot be determined."""
+    cache_home = os.environ.get('XDG_CACHE_HOME')
+    if not cache_home:
+        try:
+            cache_home = str(Path.home() / '.cache')
+        except (KeyError, RuntimeError):
+            return None
+    return Path(cache_home, 'apiclient-pydantic-generator', 'fmt')
+
+
+def stable_repr(value: Any) -> str:
+    """``repr`` that does not depend on set ordering, for hashing formatter settings."""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        value = {field.name: getattr(value, field.name) for field in dataclasses.fields(value)}
+    if isinstance(value, dict):
+        return '{' + ', '.join(sorted(f'{stable_repr(k)}: {stable_repr(v)}' for k, v in value.items())) + '}'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(stable_repr(item) for item in value)) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(stable_repr(item) for item in value) + ']'
+    return repr(value)
 
 
 class PythonVersion(Enum):
@@ -21,31 +61,278 @@ def is_supported_in_yapf(python_version: PythonVersion) -> bool:  # pragma: no c
     return True
 
 
-class YapfCodeFormatter:
-    def __init__(self, _: PythonVersion = None, settings_path: Optional[Path] = None):
+class BaseCodeFormatter(ABC):
+    """Formats generated code, caching results on disk by content hash."""
+
+    def __init__(
+        self,
+        python_version: Optional[PythonVersion] = None,
+        settings_path: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        cache_enabled: bool = True,
+    ):
         if not settings_path:
             settings_path = Path().resolve()
+        self.python_version: Optional[PythonVersion] = python_version
         self.settings_path: str = str(settings_path)
         self.pyproject_path: str = str(settings_path / 'pyproject.toml')
-        if isort.__version__.startswith('4.'):
-            self.isort_config = None
-        else:
-            self.isort_config = isort.Config(settings_path=self.settings_path)
+        if cache_enabled and not cache_dir:
+            cache_dir = get_default_cache_dir()
+        self.cache_dir: Optional[Path] = cache_dir
+        self.cache_enabled: bool = cache_enabled and cache_dir is not None
+        self._cache_salt: Optional[bytes] = None
+
+    @classmethod
+    def check_available(cls) -> None:
+        """Raise CodeFormatterError when the formatter cannot run here."""
+
+    @abstractmethod
+    def _format_code(self, code: str) -> str:
+        raise NotImplementedError
+
+    def get_cache_salt(self) -> bytes:
+        """Bytes that invalidate cached results when formatter versions or settings change."""
+        pyproject = Path(self.pyproject_path)
+        return b'\0'.join((
+            type(self).__name__.encode(),
+            pyproject.read_bytes() if pyproject.is_file() else b'',
+        ))
+
+    def _format_many(self, codes: Sequence[str]) -> List[str]:
+        return [self._format_code(code) for code in codes]
 
     def format_code(self, code: str) -> str:
+        return self.format_many([code])[0]
+
+    def format_many(self, codes: Sequence[str]) -> List[str]:
+        """Format independent sources at once, only formatting the ones missing from the cache."""
+        results: List[Optional[str]] = [self.read_cache(code) for code in codes]
+        misses = [index for index, result in enumerate(results) if result is None]
+        if misses:
+            for index, formatted in zip(misses, self._format_many([codes[index] for index in misses])):
+                results[index] = formatted
+                self.write_cache(codes[index], formatted)
+        return [result or '' for result in results]
+
+    def read_cache(self, code: str) -> Optional[str]:
+        if not self.cache_enabled or self.cache_dir is None:
+            return None
+        cache_file = self.cache_dir / self.cache_key(code)
+        try:
+            formatted = cache_file.read_bytes().decode('utf8')
+        except (OSError, UnicodeDecodeError):
+            return None
+        try:
+            os.utime(cache_file)  # entries still in use survive prune_cache
+        except OSError:
+            pass
+        return formatted
+
+    def prune_cache(self, max_age: float = CACHE_MAX_AGE) -> None:
+        """Drop cached results that were not used for ``max_age`` seconds."""
+        if not self.cache_enabled or self.cache_dir is None:
+            return
+        expire = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < expire:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+    def cache_key(self, code: str) -> str:
+        if self._cache_salt is None:
+            self._cache_salt = self.get_cache_salt()
+        return hashlib.blake2b(code.encode() + b'\0' + self._cache_salt, digest_size=16).hexdigest()
+
+    def write_cache(self, code: str, formatted: str) -> None:
+        # The cache is best effort: a read-only or racing cache dir must never break generation.
+        if not self.cache_enabled or self.cache_dir is None:
+            return
+        cache_file = self.cache_dir / self.cache_key(code)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=str(cache_file.parent), prefix='.tmp-')
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'w', encoding='utf8', newline='') as file:
+                file.write(formatted)
+            os.replace(tmp_name, str(cache_file))
+        except OSError:
+            os.unlink(tmp_name)
+
+
+class YapfCodeFormatter(BaseCodeFormatter):
+    def __init__(
+        self,
+        python_version: Optional[PythonVersion] = None,
+        settings_path: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        cache_enabled: bool = True,
+    ):
+        super().__init__(python_version, settings_path, cache_dir, cache_enabled)
+        self._isort_config: Optional[Any] = None
+        self._yapf_style: Optional[Dict[str, Any]] = None
+
+    @property
+    def isort_config(self) -> Optional[Any]:
+        import isort
+
+        # Looking up the isort settings hits the filesystem, so build them once and only when needed.
+        if self._isort_config is None and not isort.__version__.startswith('4.'):
+            self._isort_config = isort.Config(settings_path=self.settings_path, quiet=True)
+        return self._isort_config
+
+    @property
+    def yapf_style(self) -> Dict[str, Any]:
+        if self._yapf_style is None:
+            from yapf.yapflib import style as yapf_style
+
+            self._yapf_style = yapf_style.CreateStyleFromConfig(self.pyproject_path)
+        return self._yapf_style
+
+    def get_cache_salt(self) -> bytes:
+        import isort
+        import yapf
+
+        return b'\0'.join((
+            super().get_cache_salt(),
+            isort.__version__.encode(),
+            yapf.__version__.encode(),
+            # isort also reads .isort.cfg, setup.cfg, tox.ini, .editorconfig, salt with what it resolved
+            stable_repr(self.isort_config).encode(),
+        ))
+
+    def _format_code(self, code: str) -> str:
         code = self.apply_yapf(code)
         code = self.apply_isort(code)
         return code
 
+    def _format_many(self, codes: Sequence[str]) -> List[str]:
+        # One yapf run over all sources joined by a top level marker comment.
+        # isort still runs per source so imports never move between files,
+        # and a `# yapf: disable` would leak into the sources after it.
+        if len(codes) < 2 or any(SPLIT_MARKER in code or 'yapf:' in code for code in codes):
+            return super()._format_many(codes)
+        chunks = RE_SPLIT_PATTERN.split(self.apply_yapf(f'\n\n{SPLIT_MARKER}\n\n'.join(codes)))
+        if len(chunks) != len(codes):  # pragma: no cover
+            return super()._format_many(codes)
+        return [self.apply_isort(chunk.strip('\n') + '\n') for chunk in chunks]
+
     def apply_yapf(self, code: str) -> str:
-        formated_code, changed = FormatCode(code, style_config=self.pyproject_path)
+        from yapf.yapflib import style as yapf_style
+        from yapf.yapflib.yapf_api import FormatCode
+
+        # A style_config path makes yapf re-read pyproject.toml on every call,
+        # with None it keeps the global style, so install the parsed one there.
+        yapf_style.SetGlobalStyle(self.yapf_style)
+        formated_code, changed = FormatCode(code, style_config=None)
         return formated_code
 
-    if isort.__version__.startswith('4.'):
+    def apply_isort(self, code: str) -> str:
+        import isort
 
-        def apply_isort(self, code: str) -> str:
+        if isort.__version__.startswith('4.'):
             return isort.SortImports(file_contents=code, settings_path=self.settings_path).output
-    else:
+        return isort.api.sort_code_string(code, config=self.isort_config)
+
+
+class BlackCodeFormatter(BaseCodeFormatter):
+    """Black and isort, as used by datamodel-code-generator itself."""
+
+    def __init__(
+        self,
+        python_version: Optional[PythonVersion] = None,
+        settings_path: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        cache_enabled: bool = True,
+    ):
+        super().__init__(python_version, settings_path, cache_dir, cache_enabled)
+        from datamodel_code_generator import PythonVersion as DataModelPythonVersion
+        from datamodel_code_generator.format import CodeFormatter
+
+        target_version = DataModelPythonVersion(python_version.value if python_version else PythonVersion.PY_37.value)
+        self.code_formatter = CodeFormatter(target_version, Path(self.settings_path))
+
+    def get_cache_salt(self) -> bytes:
+        import black
+        import isort
+
+        return b'\0'.join((
+            super().get_cache_salt(),
+            str(self.python_version and self.python_version.value).encode(),
+            isort.__version__.encode(),
+            black.__version__.encode(),
+            stable_repr(self.code_formatter.back_mode).encode(),
+            stable_repr(self.code_formatter.isort_config).encode(),
+        ))
+
+    def _format_code(self, code: str) -> str:
+        return self.code_formatter.format_code(code)
+
+
+class RuffCodeFormatter(BaseCodeFormatter):
+    """Formats with the ``ruff`` executable, which must be available on ``PATH``."""
+
+    ruff: str = 'ruff'
+    stdin_filename: str = 'generated.py'
+    config_filenames: Sequence[str] = ('.ruff.toml', 'ruff.toml', 'pyproject.toml')
+
+    def __init__(
+        self,
+        python_version: Optional[PythonVersion] = None,
+        settings_path: Optional[Path] = None,
+        cache_dir: Optional[Path] = None,
+        cache_enabled: bool = True,
+    ):
+        self.check_available()
+        super().__init__(python_version, settings_path, cache_dir, cache_enabled)
+
+    @classmethod
+    def check_available(cls) -> None:
+        if shutil.which(cls.ruff) is None:
+            raise CodeFormatterError(f'{cls.ruff!r} executable not found on PATH, install ruff to use this formatter')
+
+    def get_cache_salt(self) -> bytes:
+        # ruff uses the closest config file and may extend others, hash every candidate up the tree
+        configs: List[bytes] = []
+        for directory in (Path(self.settings_path), *Path(self.settings_path).parents):
+            for filename in self.config_filenames:
+                config = directory / filename
+                if config.is_file():
+                    configs.append(str(config).encode() + b'\0' + config.read_bytes())
+        return b'\0'.join((super().get_cache_salt(), self._run_ruff('--version').encode(), *configs))
+
+    def _format_code(self, code: str) -> str:
+        code = self._run_ruff('format', '-', '--stdin-filename', self.stdin_filename, input_=code)
+        code = self._run_ruff(
+            'check',
+            '--select',
+            'I',
+            '--fix',
+            '--exit-zero',
+            '--quiet',
+            '-',
+            '--stdin-filename',
+            self.stdin_filename,
+            input_=code,
+        )
+        return code
 
-        def apply_isort(self, code: str) -> str:
-            return isort.code(code, config=self.isort_config)
+    def _run_ruff(self, *args: str, input_: Optional[str] = None) -> str:
+        try:
+            return subprocess.run(
+                [self.ruff, *args],
+                input=input_,
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=self.settings_path,
+            ).stdout
+        except subprocess.CalledProcessError as e:
+            raise CodeFormatterError(f'{self.ruff} {args[0]} failed: {e.stderr.strip()}') from e
@@ -1,17 +1,19 @@
 from __future__ import annotations
 
 import builtins
+import os
 import pathlib
 import re
+from functools import lru_cache
 from typing import (
-    Any, Callable, DefaultDict, Dict, Iterable, List,
-    Mapping, Optional, Pattern, Sequence, Set, Type, Union,
+    Any, Callable, DefaultDict, Dict, FrozenSet, Iterable, List,
+    Mapping, Optional, Pattern, Sequence, Set, Type, TypeVar, Union,
 )
 from urllib.parse import ParseResult
 
-import stringcase
 from datamodel_code_generator import (
-    DefaultPutDict, LiteralType, OpenAPIScope, PythonVersion, cached_property, snooper_to_methods,
+    DefaultPutDict, LiteralType, OpenAPIScope, PythonVersion,
+    cached_property, enable_debug_message, snooper_to_methods,
 )
 from datamodel_code_generator.imports import Import, Imports
 from datamodel_code_generator.model import (
@@ -27,8 +29,24 @@ from datamodel_code_generator.reference import Reference
 from datamodel_code_generator.types import DataType, DataTypeManager, StrictTypes
 from pydantic import BaseModel, validator
 
+from ._case import camelcase, pascalcase, snakecase
+
 
 RE_APPLICATION_JSON_PATTERN: Pattern[str] = re.compile(r'^application/.*json$')
+RE_PATH_PARAMETER_PATTERN: Pattern[str] = re.compile(r'{([^\}]+)}')
+RE_PATH_SEPARATOR_PATTERN: Pattern[str] = re.compile(r'/{|/')
+BUILTIN_NAMES: FrozenSet[str] = frozenset(vars(builtins))
+
+Model = TypeVar('Model', bound='CachedPropertyModel')
+T = TypeVar('T')
+
+
+def snoop_methods(cls: Type[T]) -> Type[T]:
+    """Trace every method of ``cls`` with PySnooper, only when ``APGEN_SNOOP`` is set."""
+    if not os.environ.get('APGEN_SNOOP'):
+        return cls
+    enable_debug_message()
+    return snooper_to_methods(max_variable_length=None)(cls)
 
 
 class CachedPropertyModel(BaseModel):
@@ -36,6 +54,13 @@ class CachedPropertyModel(BaseModel):
         arbitrary_types_allowed = True
         keep_untouched = (cached_property, )
 
+    @classmethod
+    def validate(cls: Type[Model], value: Any) -> Model:
+        # pydantic copies nested model instances on validation, every Operation would get its own Arguments
+        if isinstance(value, cls):
+            return value
+        return super().validate(value)
+
 
 class Response(BaseModel):
     status_code: str
@@ -50,25 +75,36 @@ class Request(BaseModel):
 
 
 class UsefulStr(str):
+    __slots__ = ()
+
     @classmethod
     def __get_validators__(cls) -> Any:
         yield cls.validate
 
     @classmethod
     def validate(cls, v: Any) -> Any:
+        try:
+            return cls._validate_cached(v)
+        except TypeError:  # unhashable value
+            return cls(v)
+
+    @classmethod
+    @lru_cache(maxsize=8192, typed=True)
+    def _validate_cached(cls, v: Any) -> Any:
+        # methods, paths and type hints repeat across operations, share one instance per value
         return cls(v)
 
     @property
     def snakecase(self) -> str:
-        return stringcase.snakecase(self)
+        return snakecase(self)
 
     @property
     def pascalcase(self) -> str:
-        return stringcase.pascalcase(self)
+        return pascalcase(self)
 
     @property
     def camelcase(self) -> str:
-        return stringcase.camelcase(self)
+        return camelcase(self)
 
 
 class Argument(CachedPropertyModel):
@@ -83,7 +119,7 @@ class Argument(CachedPropertyModel):
 
     @cached_property
     def argument(self) -> str:
-        name = self.name if self.name not in vars(builtins) else f'{self.name}_'
+        name = self.name if self.name not in BUILTIN_NAMES else f'{self.name}_'
         if self.default is None and self.required:
             return f'{name}: {self.type_hint}'
         return f'{name}: {self.type_hint} = {self.default}'
@@ -120,29 +156,28 @@ class Operation(CachedPropertyModel):
 
     @cached_property
     def snake_case_path(self) -> str:
-        return re.sub(r'{([^\}]+)}', lambda m: stringcase.snakecase(m.group()), self.path)
+        return RE_PATH_PARAMETER_PATTERN.sub(lambda m: snakecase(m.group()), self.path)
 
     @cached_property
     def function_name(self) -> str:
         if self.operationId:
             name: str = self.operationId
         else:
-            path = re.sub(r'/{|/', '_', self.snake_case_path).replace('}', '')
+            path = RE_PATH_SEPARATOR_PATTERN.sub('_', self.snake_case_path).replace('}', '')
             name = f'{self.type}{path}'
-        return stringcase.snakecase(name)
+        return snakecase(name)
 
     @validator('parameters')
     def safe_name_parameters(cls, parameters):  # noqa: N805
-        built = vars(builtins)
         for items in parameters:
             name = safe_name = items.get('name')
-            if name and name in built:
+            if name and name in BUILTIN_NAMES:
                 safe_name = f'{name}_'
             items['safe_name'] = safe_name
         return parameters
 
 
-@snooper_to_methods(max_variable_length=None)
+@snoop_methods
 class OpenAPIParser(OpenAPIModelParser):
     def __init__(
         self,
@@ -251,7 +286,7 @@ class OpenAPIParser(OpenAPIModelParser):
         orig_name = name = parameters.name
 
         if snake_case:
-            name = stringcase.snakecase(orig_name)
+            name = snakecase(orig_name)
         name, alias = self.model_resolver.get_valid_field_name_and_alias(name)
 
         schema: Optional[JsonSchemaObject] = None
@@ -340,7 +375,7 @@ class OpenAPIParser(OpenAPIModelParser):
         )
         data_type = self.data_type(reference=reference)
         ret = Argument(
-            name=stringcase.snakecase(suffix),
+            name=snakecase(suffix),
             type_hint=data_type.type_hint,
             required=True,
         )
@@ -0,0 +1,20 @@
+from apiclient_pydantic_generator._case import camelcase, pascalcase, snakecase
+from ward import each, test
+
+
+@test('test snakecase {value!r}')
+def _(
+    value=each('petId', '/pets/{petId}', 'x-request-id', 'PathParams', ''),
+    expected=each('pet_id', '/pets/{pet_id}', 'x_request_id', 'path_params', ''),
+):
+    assert snakecase(value) == expected
+
+
+@test('test camelcase and pascalcase {value!r}')
+def _(
+    value=each('pet_id', 'x_request_id', 'PetId', ''),
+    camel=each('petId', 'xRequestId', 'petId', ''),
+    pascal=each('PetId', 'XRequestId', 'PetId', ''),
+):
+    assert camelcase(value) == camel
+    assert pascalcase(value) == pascal
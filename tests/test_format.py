@@ -1,5 +1,20 @@
-from apiclient_pydantic_generator.format import YapfCodeFormatter
-from ward import test
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from apiclient_pydantic_generator.format import (
+    CodeFormatterError, RuffCodeFormatter, YapfCodeFormatter,
+)
+from ward import fixture, raises, skip, test
+
+
+@fixture
+def cache_dir():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        yield Path(tmp_dir)
 
 
 @test('test simple format')
@@ -29,4 +44,119 @@ from typing import Optional
 
 a = {1: 2, 3: 4,}
 """
-    assert YapfCodeFormatter().format_code(code) == expect_code
+    assert YapfCodeFormatter(cache_enabled=False).format_code(code) == expect_code
+
+
+@test('test format result is cached by content')
+def _(cache_dir=cache_dir):
+    code = 'a = {1: 2, 3: 4,}\n'
+    formatter = YapfCodeFormatter(cache_dir=cache_dir)
+    formatted = formatter.format_code(code)
+    cache_file = cache_dir / formatter.cache_key(code)
+    assert cache_file.read_text() == formatted
+
+    cache_file.write_text('cached = True\n')
+    assert formatter.format_code(code) == 'cached = True\n'
+
+
+@test('test cached result keeps carriage returns')
+def _(cache_dir=cache_dir):
+    code = 'def f():\n    """First line\r\nSecond line\rThird line"""\n'
+    cold = YapfCodeFormatter(cache_dir=cache_dir).format_code(code)
+    warm = YapfCodeFormatter(cache_dir=cache_dir).format_code(code)
+    assert '\r' in cold
+    assert warm == cold
+
+
+@test('test prune cache drops entries not used recently')
+def _(cache_dir=cache_dir):
+    formatter = YapfCodeFormatter(cache_dir=cache_dir)
+    formatter.format_many(['a = 1\n', 'b = 2\n'])
+    old_file, used_file = cache_dir / formatter.cache_key('a = 1\n'), cache_dir / formatter.cache_key('b = 2\n')
+    long_ago = time.time() - 60 * 24 * 60 * 60
+    os.utime(old_file, (long_ago, long_ago))
+    os.utime(used_file, (long_ago, long_ago))
+
+    assert formatter.read_cache('b = 2\n') == 'b = 2\n'
+    formatter.prune_cache()
+    assert not old_file.exists()
+    assert used_file.exists()
+
+
+@test('test disabled cache is not written')
+def _(cache_dir=cache_dir):
+    YapfCodeFormatter(cache_dir=cache_dir, cache_enabled=False).format_code('a = 1\n')
+    assert not list(cache_dir.iterdir())
+
+
+@test('test cache is disabled without a home directory')
+def _():
+    with mock.patch.dict('os.environ', {'XDG_CACHE_HOME': ''}), \
+            mock.patch.object(Path, 'home', side_effect=RuntimeError('Could not determine home directory.')):
+        formatter = YapfCodeFormatter()
+    assert not formatter.cache_enabled
+    assert formatter.format_code('a = 1\n') == 'a = 1\n'
+
+
+@test('test cache key follows isort settings outside pyproject.toml')
+def _(cache_dir=cache_dir):
+    (cache_dir / 'pyproject.toml').write_text('[tool.yapf]\nbased_on_style = "pep8"\n')
+    (cache_dir / 'setup.cfg').write_text('[isort]\nforce_single_line = false\n')
+    code = 'from os import path, sep\n'
+    assert YapfCodeFormatter(settings_path=cache_dir, cache_dir=cache_dir).format_code(code) == code
+
+    (cache_dir / 'setup.cfg').write_text('[isort]\nforce_single_line = true\n')
+    formatted = YapfCodeFormatter(settings_path=cache_dir, cache_dir=cache_dir).format_code(code)
+    assert formatted == 'from os import path\nfrom os import sep\n'
+
+
+@skip('ruff is not installed', when=shutil.which('ruff') is None)
+@test('test ruff format')
+def _(cache_dir=cache_dir):
+    code = """\
+import sys
+import os
+a = {1: 2, 3: 4,}
+"""
+    expect_code = """\
+import os
+import sys
+
+a = {
+    1: 2,
+    3: 4,
+}
+"""
+    assert RuffCodeFormatter(settings_path=cache_dir, cache_dir=cache_dir).format_code(code) == expect_code
+
+
+@test('test missing ruff executable is reported')
+def _():
+    class MissingRuffCodeFormatter(RuffCodeFormatter):
+        ruff = 'apgen-missing-ruff'
+
+    with raises(CodeFormatterError) as exc_info:
+        MissingRuffCodeFormatter(cache_enabled=False)
+    assert 'apgen-missing-ruff' in str(exc_info.raised)
+
+
+@skip('ruff is not installed', when=shutil.which('ruff') is None)
+@test('test ruff failure includes its stderr')
+def _(cache_dir=cache_dir):
+    with raises(CodeFormatterError) as exc_info:
+        RuffCodeFormatter(settings_path=cache_dir, cache_enabled=False).format_code('def (\n')
+    assert 'Failed to parse' in str(exc_info.raised)
+
+
+@test('test format many matches formatting one by one')
+def _():
+    codes = [
+        'import sys\nimport os\nclass A:\n  def f(self):\n    return {1: 2, 3: 4,}\n',
+        'from __future__ import annotations\nimport os\n\n\n\nb = [1,2]\n',
+        'c = 1\n',
+    ]
+    formatter = YapfCodeFormatter(cache_enabled=False)
+    assert formatter.format_many(codes) == [formatter.format_code(code) for code in codes]
+
+    codes = ['x = 1\n# yapf: disable\ny = [1,\n  2]\n', 'z = {1:2,  3:4}\n', 'def f( a ):\n  pass\n']
+    assert formatter.format_many(codes) == [formatter.format_code(code) for code in codes]
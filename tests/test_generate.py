@@ -0,0 +1,57 @@
+import re
+import tempfile
+import textwrap
+from pathlib import Path
+from unittest import mock
+
+from apiclient_pydantic_generator.__main__ import _format_sources, generate_code
+from apiclient_pydantic_generator.format import YapfCodeFormatter
+from datamodel_code_generator import chdir
+from datamodel_code_generator.__main__ import Config
+from ward import Scope, each, fixture, test
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+README = (ROOT_DIR / 'README.md').read_text()
+
+
+@fixture(scope=Scope.Module)
+def petstore_dir():
+    spec = textwrap.dedent(re.search(r'<code>\n(.*?)\n\s*</code>', README, re.DOTALL).group(1))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # formatter settings come from the pyproject.toml in the working directory
+        with chdir(ROOT_DIR):
+            generate_code(
+                'petstore.yaml',
+                spec,
+                Path(tmp_dir),
+                None,
+                '',
+                Config(),
+                'PetStore',
+                'apiclient.APIClient',
+                True,
+                YapfCodeFormatter,
+                format_cache=False,
+            )
+        yield Path(tmp_dir)
+
+
+@test('test generate README example {module}')
+def _(petstore_dir=petstore_dir, module=each('__init__.py', 'client.py', 'endpoints.py', 'models.py')):
+    expect_code = re.search(rf'`app_petstore/{re.escape(module)}`:\n```python\n(.*?)```', README, re.DOTALL).group(1)
+    assert (petstore_dir / module).read_text() == expect_code
+
+
+@test('test format sources in worker processes fills the cache from the parent')
+def _():
+    sources = {Path('a.py'): 'a = {1:2}\n', Path('b.py'): 'b = [1,\n  2]\n', Path('c.py'): ''}
+    with tempfile.TemporaryDirectory() as tmp_dir, mock.patch.dict('os.environ', {'XDG_CACHE_HOME': tmp_dir}):
+        with mock.patch('os.cpu_count', return_value=2):
+            results = _format_sources(sources, YapfCodeFormatter, None, ROOT_DIR)
+        cache_files = list(Path(tmp_dir).rglob('*'))
+        assert results == {Path('a.py'): 'a = {1: 2}\n', Path('b.py'): 'b = [1, 2]\n', Path('c.py'): ''}
+        assert len([path for path in cache_files if path.is_file()]) == 2
+
+        with mock.patch('apiclient_pydantic_generator.__main__.ProcessPoolExecutor', side_effect=AssertionError):
+            assert _format_sources(sources, YapfCodeFormatter, None, ROOT_DIR) == results